@@ -0,0 +1,134 @@
+import time
+import logging
+import threading
+import requests
+from core.settings import SettingsManager
+
+# Stability v1 has no endpoint listing style presets, so the known set is kept here.
+STABILITY_STYLE_PRESETS = [
+    "3d-model", "analog-film", "anime", "cinematic", "comic-book",
+    "digital-art", "enhance", "fantasy-art", "isometric", "line-art",
+    "low-poly", "modeling-compound", "neon-punk", "origami",
+    "photographic", "pixel-art", "tile-texture",
+]
+
+class ModelCatalog:
+    """In-memory cache of the Stability engines and OpenRouter models.
+
+    The lists are fetched off the request path: once at startup by a background
+    thread and again whenever the TTL expires. Lookups only ever read the cache,
+    so no user request pays for catalog discovery.
+    """
+
+    def __init__(self, settings_manager: SettingsManager, ttl: int = 3600):
+        self.settings = settings_manager
+        self.ttl = ttl
+        self.stability_host = 'https://api.stability.ai'
+        self.openrouter_url = 'https://openrouter.ai/api/v1/models'
+        self.engines = []
+        self.models = []
+        self.engines_updated = 0.0
+        self.models_updated = 0.0
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Prewarm the catalog and keep it fresh on a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="model-catalog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def refresh_async(self):
+        """Ask the background thread to refetch now, e.g. after an API key changed."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Clear before refreshing so a refresh_async() during the fetch triggers another pass.
+            self._wake.clear()
+            self.refresh()
+            self._wake.wait(timeout=self.ttl)
+
+    def refresh(self):
+        engines = self._fetch_engines()
+        models = self._fetch_models()
+        now = time.time()
+        with self._lock:
+            if engines is not None:
+                self.engines = engines
+                self.engines_updated = now
+            if models is not None:
+                self.models = models
+                self.models_updated = now
+        self.logger.info(f"Model catalog refreshed: {len(self.engines)} engines, {len(self.models)} models")
+
+    def _fetch_engines(self):
+        api_key = self.settings.get_setting('image', 'stability_api_key')
+        if not api_key:
+            return None
+        try:
+            response = requests.get(
+                f"{self.stability_host}/v1/engines/list",
+                headers={
+                    "Accept": "application/json",
+                    "Authorization": f"Bearer {api_key}"
+                },
+                timeout=10
+            )
+            if response.status_code != 200:
+                self.logger.warning(f"Stability engine list returned {response.status_code}")
+                return None
+            return [engine['id'] for engine in response.json()]
+        except Exception as e:
+            self.logger.error(f"Error fetching Stability engines: {str(e)}")
+            return None
+
+    def _fetch_models(self):
+        try:
+            response = requests.get(self.openrouter_url, timeout=10)
+            if response.status_code != 200:
+                self.logger.warning(f"OpenRouter model list returned {response.status_code}")
+                return None
+            return [model['id'] for model in response.json().get('data', [])]
+        except Exception as e:
+            self.logger.error(f"Error fetching OpenRouter models: {str(e)}")
+            return None
+
+    def get_catalog(self):
+        with self._lock:
+            return {
+                'engines': list(self.engines),
+                'models': list(self.models),
+                'style_presets': list(STABILITY_STYLE_PRESETS),
+                'engines_updated': self.engines_updated,
+                'models_updated': self.models_updated,
+            }
+
+    def validate_image_request(self, engine_id: str, style_preset: str):
+        """Raise ValueError if the engine or style preset is known to be invalid.
+
+        An empty engine list means the catalog is not loaded yet; the engine is
+        then let through rather than blocking the request on discovery.
+        """
+        with self._lock:
+            engines = list(self.engines)
+        if engines and engine_id not in engines:
+            raise ValueError(f"Unknown Stability engine '{engine_id}'. Available engines: {', '.join(engines)}")
+        if style_preset and style_preset not in STABILITY_STYLE_PRESETS:
+            raise ValueError(f"Unknown style preset '{style_preset}'. Available presets: {', '.join(STABILITY_STYLE_PRESETS)}")
+
+    def validate_chat_model(self, model: str):
+        """Raise ValueError if the model is known not to exist on OpenRouter."""
+        with self._lock:
+            models = [m.lower() for m in self.models]
+        if models and model.lower() not in models:
+            raise ValueError(f"Unknown OpenRouter model '{model}'. Pick one from the model list in settings.")
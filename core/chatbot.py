@@ -1,23 +1,55 @@
 import os
+import re
 import json
+import time
+import bisect
+import threading
 import requests
 from datetime import datetime
 from core.settings import SettingsManager
+from core.catalog import ModelCatalog
+from core.retrieval import VectorIndex, create_embedder
 import logging
 import traceback
 
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation. Keep every fact, name, "
+    "preference and decision that later turns may rely on; drop small talk. "
+    "Reply with the updated summary only."
+)
+
+def estimate_tokens(messages) -> int:
+    """Rough token count (~4 characters per token) used for prompt-size reporting."""
+    return sum(len(m["content"]) // 4 + 4 for m in messages)
+
 class Chatbot:
-    def __init__(self, settings_manager: SettingsManager):
+    def __init__(self, settings_manager: SettingsManager, catalog: ModelCatalog = None):
         self.settings = settings_manager
+        self.catalog = catalog
         self.conversation_history = []
-        self.history_file = os.path.join("data", "chat_history", "chat_history.json")
+        self.last_seq = 0
+        self.history_epoch = ""
+        self.summary = ""
+        self.summary_seq = 0
+        self.context_stats = {}
+        self._compaction_lock = threading.Lock()
+        self._history_lock = threading.Lock()
+        self.history_file = os.path.join("data", "chat_history", "chat_history.jsonl")
+        self.legacy_history_file = os.path.join("data", "chat_history", "chat_history.json")
+        self.summary_file = os.path.join("data", "chat_history", "summary.json")
         os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
         self.load_history()
+        # Recall is off until the background build publishes an index.
+        self.vector_index = None
+        self.embedding_model = None
+        self._index_generation = 0
+        self._index_thread = None
         self.api_url = "https://openrouter.ai/api/v1/chat/completions"
         self.api_key = self.settings.get_setting('api', 'openrouter_key')
         
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
+        self.refresh_embedder()
         
         # Add debug logging for API key
         self.logger.info(f"OpenRouter API key loaded: {'Present' if self.api_key else 'Missing'}")
@@ -30,66 +62,367 @@ class Chatbot:
             if not self.api_key:
                 raise ValueError("OpenRouter API key is not configured. Please set it in settings.")
 
-            self.conversation_history.append({
-                "role": "user",
-                "content": prompt
-            })
-            self.save_history()
+            model = self.settings.get_setting('chat', 'model')
+            if self.catalog:
+                self.catalog.validate_chat_model(model)
 
-            messages = [
-                {"role": "system", "content": self.settings.get_setting('chat', 'system_prompt')},
-                *self.conversation_history[-self.settings.get_setting('chat', 'context_length'):]
-            ]
+            self.append_message("user", prompt)
 
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://localhost:8000",
-                "X-Title": "AI Assistant"
-            }
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json={
-                    "model": "mistralai/Mistral-7B-Instruct-v0.2",
-                    "messages": messages,
-                    "temperature": self.settings.get_setting('chat', 'temperature'),
-                    "max_tokens": self.settings.get_setting('chat', 'max_tokens')
-                }
-            )
-            
-            if response.status_code != 200:
-                error_msg = f"API error: {response.text}"
-                self.logger.error(error_msg)
-                raise Exception(error_msg)
-                
-            reply = response.json()['choices'][0]['message']['content']
+            messages = self.build_messages()
+            data = self._complete(model, messages,
+                                  self.settings.get_setting('chat', 'temperature'),
+                                  self.settings.get_setting('chat', 'max_tokens'))
+            reply = data['choices'][0]['message']['content']
+            self._report_context(messages, data.get('usage', {}))
             
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": reply
-            })
-            self.save_history()
+            self.append_message("assistant", reply)
+            self.maybe_compact_async()
             return reply
         except Exception as e:
             logging.error(f"API error: {e}")
             return f"Error: {e}"
 
+    def _complete(self, model: str, messages: list, temperature, max_tokens) -> dict:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost:8000",
+            "X-Title": "AI Assistant"
+        }
+        response = requests.post(
+            self.api_url,
+            headers=headers,
+            json={
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens
+            }
+        )
+        
+        if response.status_code != 200:
+            error_msg = f"API error: {response.text}"
+            self.logger.error(error_msg)
+            raise Exception(error_msg)
+            
+        return response.json()
+
+    def _recent_turns(self) -> list:
+        """History records not yet folded into the summary."""
+        start = bisect.bisect_right(self.conversation_history, self.summary_seq, key=lambda m: m["seq"])
+        return self.conversation_history[start:]
+
+    def build_messages(self) -> list:
+        """System prompt, rolling summary, recalled turns, then the unsummarized turns."""
+        context_length = int(self.settings.get_setting('chat', 'context_length'))
+        messages = [{"role": "system", "content": self.settings.get_setting('chat', 'system_prompt')}]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        recent = [{"role": m["role"], "content": m["content"]}
+                  for m in self._recent_turns()[-context_length:]]
+        window_start = self.conversation_history[-len(recent)]["seq"] if recent else self.last_seq + 1
+        # context_length counts messages; recalled turns get their own token budget.
+        recalled = self._recall(window_start, int(self.settings.get_setting('chat', 'retrieval_token_budget', 1000)))
+        if recalled:
+            lines = "\n".join(f"{m['role']}: {m['content']}" for m in recalled)
+            messages.append({"role": "system", "content": f"Relevant earlier messages:\n{lines}"})
+        messages.extend(recent)
+        return messages
+
+    def _recall(self, before_seq: int, budget: int) -> list:
+        """Pick the past turns most similar to the latest message that fit in ``budget`` tokens."""
+        top_k = int(self.settings.get_setting('chat', 'retrieval_top_k', 0))
+        vector_index = self.vector_index
+        if top_k <= 0 or budget <= 0 or not self.conversation_history or vector_index is None:
+            return []
+        latest = self.conversation_history[-1]
+        query = vector_index.vector_for(latest["seq"])
+        if query is None:
+            query = vector_index.embedder.embed(latest["content"])
+        recalled = []
+        min_score = float(self.settings.get_setting('chat', 'retrieval_min_score', 0.1))
+        for seq, _score in vector_index.search(query, before_seq, top_k, min_score):
+            message = self._message_by_seq(seq)
+            if message is None:
+                continue
+            cost = estimate_tokens([message])
+            if cost > budget:
+                continue
+            budget -= cost
+            recalled.append(message)
+        recalled.sort(key=lambda m: m["seq"])
+        return recalled
+
+    def _message_by_seq(self, seq: int):
+        i = bisect.bisect_left(self.conversation_history, seq, key=lambda m: m["seq"])
+        if i < len(self.conversation_history) and self.conversation_history[i]["seq"] == seq:
+            return self.conversation_history[i]
+        return None
+
+    def refresh_embedder(self):
+        """(Re)build the embedder and vector index on a background thread if the setting changed.
+
+        Each embedder keeps its own index directory, so switching models never
+        touches the files the current index has mapped. The old index keeps
+        serving recall until the new one has caught up with the history.
+        """
+        model_name = self.settings.get_setting('chat', 'embedding_model', '') or ''
+        if model_name == self.embedding_model:
+            return
+        self.embedding_model = model_name
+        self._index_generation += 1
+        self._start_index_build(model_name, self._index_generation)
+
+    def _start_index_build(self, model_name: str, generation: int):
+        previous = self._index_thread
+        self._index_thread = threading.Thread(target=self._build_vector_index,
+                                              args=(model_name, generation, previous),
+                                              name="chat-vector-index", daemon=True)
+        self._index_thread.start()
+
+    def _build_vector_index(self, model_name: str, generation: int, previous: threading.Thread = None):
+        try:
+            if previous is not None:
+                # A superseded build stops after its current turn; let it finish before
+                # this one may reopen the same directory.
+                previous.join()
+            embedder = create_embedder(model_name)
+            if self.vector_index is not None and self.vector_index.embedder.name == embedder.name:
+                # e.g. a model that failed to load fell back to the embedder already in use.
+                return
+            directory = os.path.join(os.path.dirname(self.history_file), "vectors",
+                                     re.sub(r"[^\w.-]", "_", embedder.name))
+            with self._history_lock:
+                epoch = self.history_epoch
+            # An index left from before a clear has another epoch and starts empty.
+            vector_index = VectorIndex(directory, embedder, epoch)
+            while generation == self._index_generation:
+                with self._history_lock:
+                    if generation != self._index_generation:
+                        return
+                    start = bisect.bisect_right(self.conversation_history, vector_index.last_seq,
+                                                key=lambda m: m["seq"])
+                    pending = self.conversation_history[start:]
+                    if not pending:
+                        # Publishing under the lock means every later append sees this index.
+                        self.vector_index = vector_index
+                        self.logger.info(f"Vector index ready: {embedder.name}, {vector_index.count} turns")
+                        return
+                for message in pending:
+                    if generation != self._index_generation:
+                        return
+                    vector_index.add(message["seq"], message["content"])
+        except Exception as e:
+            self.logger.error(f"Error building vector index: {e}")
+
+    def _report_context(self, messages: list, usage: dict):
+        full_tokens = estimate_tokens(self.conversation_history) + estimate_tokens(messages[:1])
+        self.context_stats = {
+            "full_history_tokens": full_tokens,
+            "prompt_tokens": estimate_tokens(messages),
+            "upstream_prompt_tokens": usage.get('prompt_tokens'),
+            "summarized_through": self.summary_seq
+        }
+        self.logger.info(f"Prompt tokens: {self.context_stats['prompt_tokens']} "
+                         f"(full transcript would be ~{full_tokens}, upstream counted "
+                         f"{self.context_stats['upstream_prompt_tokens']})")
+
+    def maybe_compact_async(self):
+        """Fold older turns into the summary on a background thread once past the threshold.
+
+        The prompt keeps between ``history_size`` and twice that many verbatim turns;
+        crossing the upper bound folds all but the newest ``history_size`` turns.
+        """
+        history_size = int(self.settings.get_setting('chat', 'history_size'))
+        if len(self._recent_turns()) <= 2 * history_size or self._compaction_lock.locked():
+            return
+        threading.Thread(target=self.compact_history, args=(history_size,), daemon=True).start()
+
+    def compact_history(self, history_size: int):
+        if not self._compaction_lock.acquire(blocking=False):
+            return
+        try:
+            with self._history_lock:
+                epoch = self.history_epoch
+                to_fold = self._recent_turns()[:-history_size]
+            if not to_fold:
+                return
+            before = estimate_tokens(self.build_messages())
+            transcript = "\n".join(f"{m['role']}: {m['content']}" for m in to_fold)
+            data = self._complete(
+                self.settings.get_setting('chat', 'model'),
+                [
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Current summary:\n{self.summary or '(none)'}\n\nNew turns:\n{transcript}"}
+                ],
+                0.2,
+                self.settings.get_setting('chat', 'max_tokens')
+            )
+            with self._history_lock:
+                if epoch != self.history_epoch:
+                    # History was cleared while the summary was being written.
+                    return
+                self.summary = data['choices'][0]['message']['content'].strip()
+                self.summary_seq = to_fold[-1]["seq"]
+                self.save_summary()
+            self.logger.info(f"Folded {len(to_fold)} turns into the summary: prompt ~{before} -> "
+                             f"~{estimate_tokens(self.build_messages())} tokens")
+        except Exception as e:
+            self.logger.error(f"Error compacting chat history: {e}")
+        finally:
+            self._compaction_lock.release()
+
+    def load_summary(self):
+        try:
+            if os.path.exists(self.summary_file):
+                with open(self.summary_file, 'r') as f:
+                    data = json.load(f)
+                self.summary = data.get("summary", "")
+                self.summary_seq = data.get("through_seq", 0)
+                # Summaries saved before the epoch was recorded fall back to the seq check.
+                if data.get("epoch", self.history_epoch) != self.history_epoch or self.summary_seq > self.last_seq:
+                    # The summary belongs to a history that no longer exists.
+                    self.summary = ""
+                    self.summary_seq = 0
+            else:
+                self.summary = ""
+                self.summary_seq = 0
+        except Exception as e:
+            logging.error(f"Error loading chat summary: {e}")
+            self.summary = ""
+            self.summary_seq = 0
+
+    def save_summary(self):
+        try:
+            with open(self.summary_file, 'w') as f:
+                json.dump({"summary": self.summary, "through_seq": self.summary_seq,
+                           "epoch": self.history_epoch}, f, indent=2)
+        except Exception as e:
+            logging.error(f"Error saving chat summary: {e}")
+
+    def append_message(self, role: str, content: str) -> dict:
+        """Append a history record tagged with the next sequence number and persist just that line."""
+        with self._history_lock:
+            self.last_seq += 1
+            message = {
+                "role": role,
+                "content": content,
+                "seq": self.last_seq,
+                "timestamp": datetime.now().isoformat()
+            }
+            self.conversation_history.append(message)
+            try:
+                with open(self.history_file, 'a') as f:
+                    f.write(json.dumps(message) + "\n")
+            except Exception as e:
+                logging.error(f"Error saving chat message: {e}")
+            vector_index = self.vector_index
+        if vector_index is not None:
+            vector_index.add(message["seq"], content)
+        return message
+
+    def get_history(self, since: int = None, before: int = None, limit: int = None) -> dict:
+        """Return one consistent page of the history.
+
+        ``since`` returns the records after that sequence number, oldest first,
+        and ``has_more`` means newer records remain. ``before`` pages backwards for
+        scrollback. With neither, the newest ``limit`` records are returned. For
+        ``before`` and the default, ``has_more`` means older records exist.
+        ``cursor`` is the seq to pass as ``since`` next: the newest record in the
+        page, or ``since`` itself when the page is empty. The page, cursor and
+        ``etag`` all come from the same snapshot.
+        """
+        with self._history_lock:
+            history = self.conversation_history
+            etag = f"{self.history_epoch}-{self.last_seq}"
+            epoch = self.history_epoch
+            if since is not None:
+                start = bisect.bisect_right(history, since, key=lambda m: m["seq"])
+                end = len(history) if limit is None else min(len(history), start + limit)
+                has_more = end < len(history)
+            else:
+                end = len(history)
+                if before is not None:
+                    end = bisect.bisect_left(history, before, key=lambda m: m["seq"])
+                start = 0 if limit is None else max(0, end - limit)
+                has_more = start > 0
+            messages = history[start:end]
+        if messages:
+            cursor = messages[-1]["seq"]
+        else:
+            cursor = since if since is not None else 0
+        return {"messages": messages, "cursor": cursor, "epoch": epoch,
+                "etag": etag, "has_more": has_more}
+
+    def clear_history(self):
+        with self._history_lock:
+            self.conversation_history = []
+            self.history_epoch = format(time.time_ns(), "x")
+            self.save_history()
+            self.summary = ""
+            self.summary_seq = 0
+            self.save_summary()
+            # Any build still indexing the wiped turns is superseded and restarted.
+            self._index_generation += 1
+            generation = self._index_generation
+            if self.vector_index is not None:
+                self.vector_index.clear(self.history_epoch, self.last_seq + 1)
+        self._start_index_build(self.embedding_model, generation)
+
     def load_history(self):
+        """Replay the JSON-lines history log, migrating the old JSON list file once.
+
+        The first line of the log is a header holding the history epoch, which
+        only changes when the history is cleared; every other line is a record.
+        """
+        self.conversation_history = []
+        self.history_epoch = ""
+        migrate = False
         try:
-            if os.path.exists(self.history_file) and os.path.getsize(self.history_file) > 0:
+            if os.path.exists(self.history_file):
                 with open(self.history_file, 'r') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A torn final line from a crash mid-append; everything before it is
+                            # intact. Rewrite the log so the next append starts on a fresh line.
+                            logging.warning("Skipping corrupt line in chat history")
+                            migrate = True
+                            continue
+                        if "epoch" in record and "role" not in record:
+                            self.history_epoch = record["epoch"]
+                        else:
+                            self.conversation_history.append(record)
+            elif os.path.exists(self.legacy_history_file) and os.path.getsize(self.legacy_history_file) > 0:
+                with open(self.legacy_history_file, 'r') as f:
                     self.conversation_history = json.load(f)
-            else:
-                self.conversation_history = []
+                migrate = True
         except Exception as e:
             logging.error(f"Error loading chat history: {e}")
             self.conversation_history = []
+        # Records saved before sequence numbers existed are numbered in file order.
+        self.last_seq = 0
+        for message in self.conversation_history:
+            if "seq" not in message:
+                message["seq"] = self.last_seq + 1
+            self.last_seq = message["seq"]
+        if not self.history_epoch:
+            self.history_epoch = format(time.time_ns(), "x")
+            migrate = True
+        if migrate:
+            self.save_history()
+        self.load_summary()
 
     def save_history(self):
+        """Rewrite the whole log; only needed on clear and migration, appends go line by line."""
         try:
             os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
-            with open(self.history_file, 'w') as f:
-                json.dump(self.conversation_history, f, indent=2)
+            tmp_file = self.history_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                f.write(json.dumps({"epoch": self.history_epoch}) + "\n")
+                for message in self.conversation_history:
+                    f.write(json.dumps(message) + "\n")
+            os.replace(tmp_file, self.history_file)
         except Exception as e:
             logging.error(f"Error saving chat history: {e}") 
\ No newline at end of file
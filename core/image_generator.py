@@ -5,6 +5,8 @@ import requests
 from PIL import Image
 from io import BytesIO
 from core.settings import SettingsManager
+from core.catalog import ModelCatalog
+from core.image_store import PackImageStore
 import logging
 import json
 from datetime import datetime
@@ -12,12 +14,15 @@ import traceback
 import shutil
 
 class ImageGenerator:
-    def __init__(self, settings_manager: SettingsManager):
+    def __init__(self, settings_manager: SettingsManager, catalog: ModelCatalog = None,
+                 image_store: PackImageStore = None):
         self.settings_manager = settings_manager
+        self.catalog = catalog
+        self.image_store = image_store
         self.settings = self.settings_manager.get_all_settings()
         self.api_key = self.settings_manager.get_setting('image', 'stability_api_key')
         self.api_host = 'https://api.stability.ai'
-        self.engine_id = 'stable-diffusion-v1-6'
+        self.engine_id = self.settings_manager.get_setting('image', 'engine_id', 'stable-diffusion-v1-6')
         self.output_dir = os.path.join("data", "generated_images")
         self.index_file = os.path.join(self.output_dir, "images.json")
         self.max_storage_gb = 1  # Maximum storage in GB
@@ -90,6 +95,11 @@ class ImageGenerator:
         
         if not self.api_key:
             raise ValueError("Stability API key is not configured. Please set it in settings.")
+
+        self.engine_id = self.settings_manager.get_setting('image', 'engine_id', self.engine_id)
+        style_preset = self.settings_manager.get_setting('image', 'style_preset')
+        if self.catalog:
+            self.catalog.validate_image_request(self.engine_id, style_preset)
             
         url = f"{self.api_host}/v1/generation/{self.engine_id}/text-to-image"
         
@@ -105,7 +115,7 @@ class ImageGenerator:
             "width": 512,
             "samples": 1,
             "steps": self.settings['image']['steps'],
-            "style_preset": self.settings['image']['style_preset']
+            "style_preset": style_preset
         }
         
         headers = {
@@ -137,6 +147,10 @@ class ImageGenerator:
                 raise Exception("No image data in response")
                 
             base64_image = data["artifacts"][0]["base64"]
+
+            if self.image_store:
+                # The pack store keeps the single stored copy; skip the loose JPEG.
+                return base64_image
             
             try:
                 image_data = base64.b64decode(base64_image)
@@ -178,11 +192,9 @@ class ImageGenerator:
         elif response.status_code == 403:
             return "API key doesn't have access to this engine. Please check your subscription."
         elif response.status_code == 404:
-            available_engines = self._get_available_engines()
-            if available_engines:
-                self.engine_id = available_engines[0]
-                return f"Engine not found. Switching to available engine: {available_engines[0]}"
-            return f"Engine not found. Available engines: {available_engines}"
+            if self.catalog:
+                self.catalog.refresh_async()
+            return f"Engine '{self.engine_id}' not found. Pick an available engine in the image settings."
         elif response.status_code == 429:
             return "Rate limit exceeded or insufficient credits. Please check your Stability AI account balance."
         else:
@@ -204,20 +216,3 @@ class ImageGenerator:
         except Exception as e:
             print(f"Error generating image: {e}")
             raise Exception(f"Failed to generate image: {str(e)}")
-
-    def _get_available_engines(self):
-        """Get list of available engines for the API key."""
-        try:
-            url = f"{self.api_host}/v1/engines/list"
-            headers = {
-                "Accept": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                engines = response.json()
-                return [engine['id'] for engine in engines]
-            return []
-        except Exception as e:
-            self.logger.error(f"Error getting available engines: {str(e)}")
-            return [] 
\ No newline at end of file
@@ -0,0 +1,305 @@
+import os
+import io
+import json
+import logging
+import threading
+from datetime import datetime
+from PIL import Image
+
+class PackSlice(io.RawIOBase):
+    """Read-only view of one entry inside a pack file.
+
+    It exposes ``fileno()`` and starts positioned at the entry offset, so an
+    external WSGI server whose ``wsgi.file_wrapper`` uses ``sendfile`` (e.g.
+    gunicorn) can serve it zero-copy. The bundled werkzeug server (``app.run`` and
+    the desktop shell's ``make_server``) has no such wrapper and only accepts
+    ``bytes``, so there the entry is copied through Python in chunks; the file is
+    opened unbuffered to avoid a second copy.
+    """
+
+    def __init__(self, path: str, offset: int, length: int):
+        super().__init__()
+        self._file = open(path, 'rb', buffering=0)
+        self._file.seek(offset)
+        self._remaining = length
+
+    def readable(self):
+        return True
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def tell(self):
+        return self._file.tell()
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:self._remaining]
+        n = self._file.readinto(view)
+        self._remaining -= n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+class PackImageStore:
+    """Append-only pack file storage for generated images and their thumbnails.
+
+    Image bytes are appended to ``pack_NNNNN.pack`` files and located through an
+    append-only ``index.log`` of JSON lines, which is replayed at startup. Deleted
+    entries only leave dead bytes behind until ``compact`` rewrites the packs.
+    """
+
+    def __init__(self, root: str, max_pack_bytes: int = 256 * 1024 * 1024,
+                 max_storage_bytes: int = 1024 * 1024 * 1024, thumbnail_size: int = 256):
+        self.root = root
+        self.index_file = os.path.join(root, "index.log")
+        self.max_pack_bytes = max_pack_bytes
+        self.max_storage_bytes = max_storage_bytes
+        self.thumbnail_size = thumbnail_size
+        self.entries = {}
+        self.live_bytes = 0
+        self.dead_bytes = 0
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._compacting = False
+        self._stale_packs = set()
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+        self.next_pack = self._latest_pack() + 1
+        self.active_pack = self.next_pack - 1
+        if os.path.exists(self.index_file):
+            # Packs left behind by a compaction whose cleanup was deferred or interrupted.
+            self._stale_packs = set(self._pack_numbers()) - self._referenced_packs() - {self.active_pack}
+            self._remove_stale_packs()
+
+    def _pack_path(self, pack: int) -> str:
+        return os.path.join(self.root, f"pack_{pack:05d}.pack")
+
+    def _pack_numbers(self):
+        return [int(f[5:10]) for f in os.listdir(self.root)
+                if f.startswith("pack_") and f.endswith(".pack")]
+
+    def _latest_pack(self) -> int:
+        return max(self._pack_numbers(), default=0)
+
+    def _new_pack(self) -> int:
+        pack = self.next_pack
+        self.next_pack += 1
+        return pack
+
+    def _referenced_packs(self) -> set:
+        packs = set()
+        for entry in self.entries.values():
+            packs.add(entry['pack'])
+            if entry.get('thumb'):
+                packs.add(entry['thumb']['pack'])
+        return packs
+
+    def _load_index(self):
+        if not os.path.exists(self.index_file):
+            return
+        with open(self.index_file, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-append; everything before it is intact.
+                    self.logger.warning("Skipping corrupt line in pack index")
+                    continue
+                if record['op'] == 'put':
+                    self._drop(record['name'])
+                    self.entries[record['name']] = record['entry']
+                    self.live_bytes += self._entry_bytes(record['entry'])
+                elif record['op'] == 'del':
+                    self._drop(record['name'])
+
+    def _append_index(self, record: dict):
+        with open(self.index_file, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+    def _drop(self, name: str):
+        entry = self.entries.pop(name, None)
+        if entry is None:
+            return False
+        size = self._entry_bytes(entry)
+        self.live_bytes -= size
+        self.dead_bytes += size
+        return True
+
+    @staticmethod
+    def _entry_bytes(entry: dict) -> int:
+        return entry['length'] + (entry['thumb']['length'] if entry.get('thumb') else 0)
+
+    def _append_blob(self, data: bytes):
+        path = self._pack_path(self.active_pack)
+        if os.path.exists(path) and os.path.getsize(path) + len(data) > self.max_pack_bytes:
+            self.active_pack = self._new_pack()
+            path = self._pack_path(self.active_pack)
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(data)
+        return {'pack': self.active_pack, 'offset': offset, 'length': len(data)}
+
+    def _make_thumbnail(self, data: bytes):
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            if image.mode in ('RGBA', 'P'):
+                image = image.convert('RGB')
+            out = io.BytesIO()
+            image.save(out, 'JPEG', quality=80)
+            return out.getvalue()
+        except Exception as e:
+            self.logger.error(f"Error creating thumbnail: {e}")
+            return None
+
+    def put(self, name: str, data: bytes, mimetype: str = 'image/png'):
+        """Append an image and its thumbnail, then evict old images over the limit."""
+        thumbnail = self._make_thumbnail(data)
+        with self._lock:
+            entry = self._append_blob(data)
+            entry['mimetype'] = mimetype
+            entry['timestamp'] = str(datetime.now())
+            entry['thumb'] = None
+            if thumbnail:
+                entry['thumb'] = self._append_blob(thumbnail)
+                entry['thumb']['mimetype'] = 'image/jpeg'
+            self._drop(name)
+            self.entries[name] = entry
+            self.live_bytes += self._entry_bytes(entry)
+            self._append_index({'op': 'put', 'name': name, 'entry': entry})
+            self._evict()
+
+    def delete(self, name: str):
+        with self._lock:
+            if not self._drop(name):
+                return
+            self._append_index({'op': 'del', 'name': name})
+
+    def _evict(self):
+        if self.live_bytes > self.max_storage_bytes:
+            for name in reversed(self.list()):
+                if self.live_bytes <= self.max_storage_bytes:
+                    break
+                self.delete(name)
+        if self.dead_bytes > self.live_bytes and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._compact_in_background, name="image-pack-compaction",
+                             daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            self.logger.error(f"Error compacting image packs: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def list(self):
+        """Return image names, newest first."""
+        with self._lock:
+            items = list(self.entries.items())
+        items.sort(key=lambda item: datetime.fromisoformat(item[1]['timestamp']), reverse=True)
+        return [name for name, _ in items]
+
+    def list_with_times(self):
+        """Return ``(name, unix_time)`` pairs, newest first."""
+        with self._lock:
+            items = [(name, datetime.fromisoformat(entry['timestamp']).timestamp())
+                     for name, entry in self.entries.items()]
+        items.sort(key=lambda item: item[1], reverse=True)
+        return items
+
+    def _locate(self, name: str, thumbnail: bool = False):
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        if thumbnail and entry.get('thumb'):
+            return entry['thumb']
+        return entry
+
+    def open(self, name: str, thumbnail: bool = False):
+        """Return ``(file, length, mimetype)`` for streaming an entry, or None if missing."""
+        with self._lock:
+            location = self._locate(name, thumbnail)
+            if location is None:
+                return None
+            path = self._pack_path(location['pack'])
+        return PackSlice(path, location['offset'], location['length']), location['length'], location['mimetype']
+
+    def _read_location(self, location: dict) -> bytes:
+        with open(self._pack_path(location['pack']), 'rb', buffering=0) as f:
+            f.seek(location['offset'])
+            return f.read(location['length'])
+
+    def compact(self):
+        """Rewrite live entries into fresh packs and drop the dead bytes.
+
+        Live data is copied without holding the lock, so reads and puts carry on
+        meanwhile; only the final swap of the index takes the lock. Puts during the
+        copy go to a pack opened at the start and are left where they are.
+        """
+        with self._lock:
+            self._remove_stale_packs()
+            snapshot = dict(self.entries)
+            old_packs = set(self._pack_numbers()) | self._referenced_packs()
+            self.active_pack = self._new_pack()
+            dead_before = self.dead_bytes
+
+        pack, pack_size = None, 0
+        def write(data: bytes, mimetype: str) -> dict:
+            nonlocal pack, pack_size
+            if pack is None or pack_size + len(data) > self.max_pack_bytes:
+                with self._lock:
+                    pack = self._new_pack()
+                pack_size = 0
+            with open(self._pack_path(pack), 'ab') as f:
+                f.write(data)
+            location = {'pack': pack, 'offset': pack_size, 'length': len(data), 'mimetype': mimetype}
+            pack_size += len(data)
+            return location
+
+        compacted = {}
+        for name, entry in snapshot.items():
+            new_entry = write(self._read_location(entry), entry['mimetype'])
+            new_entry['timestamp'] = entry['timestamp']
+            new_entry['thumb'] = None
+            if entry.get('thumb'):
+                new_entry['thumb'] = write(self._read_location(entry['thumb']), entry['thumb']['mimetype'])
+            compacted[name] = new_entry
+
+        with self._lock:
+            # Entries replaced or deleted during the copy keep their newer state; their
+            # dead bytes move from the old packs to the compacted ones, so only the
+            # dead bytes that existed at the snapshot are reclaimed.
+            for name, new_entry in compacted.items():
+                if self.entries.get(name) is snapshot[name]:
+                    self.entries[name] = new_entry
+            self.dead_bytes -= dead_before
+
+            tmp_index = self.index_file + ".tmp"
+            with open(tmp_index, 'w') as f:
+                for name, entry in self.entries.items():
+                    f.write(json.dumps({'op': 'put', 'name': name, 'entry': entry}) + "\n")
+            os.replace(tmp_index, self.index_file)
+
+            self._stale_packs |= old_packs
+            self._remove_stale_packs()
+            self.logger.info(f"Compacted image packs: {len(compacted)} live images")
+
+    def _remove_stale_packs(self):
+        """Delete superseded packs; ones still open (e.g. by a stream on Windows) are retried later."""
+        for pack in list(self._stale_packs):
+            try:
+                if os.path.exists(self._pack_path(pack)):
+                    os.remove(self._pack_path(pack))
+                self._stale_packs.discard(pack)
+            except OSError as e:
+                self.logger.warning(f"Deferring removal of {self._pack_path(pack)}: {e}")
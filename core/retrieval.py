@@ -0,0 +1,176 @@
+import os
+import re
+import json
+import zlib
+import logging
+import threading
+import numpy as np
+
+class HashingEmbedder:
+    """Dependency-free embedding: signed feature hashing of words and word bigrams."""
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, text: str) -> np.ndarray:
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class TransformerEmbedder:
+    """Mean-pooled sentence embeddings from a small transformers model on CPU."""
+
+    def __init__(self, model_name: str):
+        from transformers import AutoTokenizer, AutoModel
+        import torch
+        self.torch = torch
+        self.name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+        self.dim = self.model.config.hidden_size
+
+    def embed(self, text: str) -> np.ndarray:
+        inputs = self.tokenizer(text, truncation=True, max_length=256, return_tensors="pt")
+        with self.torch.no_grad():
+            hidden = self.model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        vector = ((hidden * mask).sum(dim=1) / mask.sum(dim=1))[0].numpy().astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+def create_embedder(model_name: str = ""):
+    """Return a transformers embedder for ``model_name``, or the hashing fallback."""
+    if model_name:
+        try:
+            return TransformerEmbedder(model_name)
+        except Exception as e:
+            logging.error(f"Error loading embedding model {model_name}, using hashing fallback: {e}")
+    return HashingEmbedder()
+
+class VectorIndex:
+    """Append-only, memory-mapped matrix of unit vectors keyed by history seq.
+
+    Vectors and seqs live in ``.npy`` files opened with ``np.load(mmap_mode=...)``;
+    the live row count, embedder name and history epoch are kept in a small JSON
+    sidecar. Rows are appended in seq order, so "everything before seq N" is a
+    prefix slice. An index saved for another history epoch is discarded on open.
+    """
+
+    def __init__(self, directory: str, embedder, epoch: str = "", initial_capacity: int = 1024):
+        self.directory = directory
+        self.embedder = embedder
+        self.epoch = epoch
+        self.first_seq = 0
+        self.vectors_file = os.path.join(directory, "vectors.npy")
+        self.seqs_file = os.path.join(directory, "vector_seqs.npy")
+        self.meta_file = os.path.join(directory, "vectors.json")
+        self.initial_capacity = initial_capacity
+        self.count = 0
+        self.vectors = None
+        self.seqs = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        meta = {}
+        if os.path.exists(self.meta_file):
+            try:
+                with open(self.meta_file, 'r') as f:
+                    meta = json.load(f)
+            except Exception as e:
+                logging.error(f"Error loading vector index metadata: {e}")
+        compatible = (meta.get("embedder") == self.embedder.name and meta.get("epoch") == self.epoch
+                      and os.path.exists(self.vectors_file) and os.path.exists(self.seqs_file))
+        if compatible:
+            self.vectors = np.load(self.vectors_file, mmap_mode='r+')
+            self.seqs = np.load(self.seqs_file, mmap_mode='r+')
+            self.count = min(meta.get("count", 0), len(self.seqs))
+            self.first_seq = meta.get("first_seq", 0)
+        else:
+            self._allocate(self.initial_capacity)
+            self.count = 0
+            self._save_meta()
+
+    def _allocate(self, capacity: int):
+        vectors = np.lib.format.open_memmap(self.vectors_file + ".tmp", mode='w+',
+                                            dtype=np.float32, shape=(capacity, self.embedder.dim))
+        seqs = np.lib.format.open_memmap(self.seqs_file + ".tmp", mode='w+',
+                                         dtype=np.int64, shape=(capacity,))
+        if self.vectors is not None:
+            vectors[:self.count] = self.vectors[:self.count]
+            seqs[:self.count] = self.seqs[:self.count]
+        vectors.flush()
+        seqs.flush()
+        # Drop every mapping of the old files first; Windows refuses to replace mapped files.
+        del vectors, seqs
+        self.vectors = self.seqs = None
+        os.replace(self.vectors_file + ".tmp", self.vectors_file)
+        os.replace(self.seqs_file + ".tmp", self.seqs_file)
+        self.vectors = np.load(self.vectors_file, mmap_mode='r+')
+        self.seqs = np.load(self.seqs_file, mmap_mode='r+')
+
+    def _save_meta(self):
+        with open(self.meta_file, 'w') as f:
+            json.dump({"embedder": self.embedder.name, "dim": self.embedder.dim, "count": self.count,
+                       "epoch": self.epoch, "first_seq": self.first_seq}, f)
+
+    @property
+    def last_seq(self) -> int:
+        return int(self.seqs[self.count - 1]) if self.count else 0
+
+    def add(self, seq: int, text: str):
+        vector = self.embedder.embed(text)
+        with self._lock:
+            if seq < self.first_seq or (self.count and seq <= self.last_seq):
+                return
+            if self.count == len(self.seqs):
+                self._allocate(len(self.seqs) * 2)
+            self.vectors[self.count] = vector
+            self.seqs[self.count] = seq
+            self.count += 1
+            self._save_meta()
+
+    def search(self, query: np.ndarray, before_seq: int, k: int, min_score: float = 0.0):
+        """Return ``[(seq, score), ...]`` for the top ``k`` rows with seq < ``before_seq``.
+
+        Rows scoring at or below ``min_score`` (never less than 0) are dropped, so
+        fewer than ``k`` results, or none, come back when nothing is similar enough.
+        """
+        min_score = max(min_score, 0.0)
+        with self._lock:
+            seqs = self.seqs[:self.count]
+            end = int(np.searchsorted(seqs, before_seq))
+            if end == 0 or k <= 0:
+                return []
+            scores = self.vectors[:end] @ query
+        k = min(k, end)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(seqs[i]), float(scores[i])) for i in top if scores[i] > min_score]
+
+    def vector_for(self, seq: int):
+        with self._lock:
+            i = int(np.searchsorted(self.seqs[:self.count], seq))
+            if i < self.count and self.seqs[i] == seq:
+                return np.array(self.vectors[i])
+        return None
+
+    def clear(self, epoch: str, first_seq: int):
+        """Drop every row and start over for a new history epoch.
+
+        Adds for seqs below ``first_seq`` (turns of the wiped history still in
+        flight) are ignored.
+        """
+        with self._lock:
+            self.count = 0
+            self.epoch = epoch
+            self.first_seq = first_seq
+            self._save_meta()
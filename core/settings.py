@@ -11,20 +11,27 @@ class GeneralSettings:
 
 @dataclass
 class ChatSettings:
+    model: str = "mistralai/Mistral-7B-Instruct-v0.2"
     system_prompt: str = "You are a helpful AI assistant."
     context_length: int = 4096
     history_size: int = 10
     temperature: float = 0.7
     max_tokens: int = 2000
+    retrieval_top_k: int = 4
+    retrieval_token_budget: int = 1000
+    retrieval_min_score: float = 0.1
+    embedding_model: str = ""
 
 @dataclass
 class ImageSettings:
     stability_api_key: str = ""
+    engine_id: str = "stable-diffusion-v1-6"
     width: int = 512
     height: int = 512
     steps: int = 30
     cfg_scale: float = 7.0
     style_preset: str = "photographic"
+    storage_backend: str = "files"
 
 @dataclass
 class ThemeSettings:
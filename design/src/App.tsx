@@ -29,7 +29,7 @@ export default function App() {
     // Fetch initial settings to get the theme
     const fetchInitialSettings = async () => {
       try {
-        const response = await fetch('http://localhost:8000/api/settings');
+        const response = await fetch('/api/settings');
         if (response.ok) {
           const data = await response.json();
           if (data.theme && data.theme.theme) {
@@ -59,7 +59,7 @@ export default function App() {
   // Handle settings save
   const handleSaveSettings = async (section: string, newSettings: any) => {
     try {
-      const response = await fetch('http://localhost:8000/api/settings', {
+      const response = await fetch('/api/settings', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -95,7 +95,7 @@ export default function App() {
   // Handle image generation
   const handleGenerateImage = async (prompt: string) => {
     try {
-      const response = await fetch('http://localhost:8000/api/generate-image', {
+      const response = await fetch('/api/generate-image', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -2,10 +2,20 @@ import { useState, useRef, useEffect } from "react";
 import { Input } from "@/components/ui/input";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent } from "@/components/ui/card";
-import { Message } from "@/types/chat";
+import { HistoryPage, HistoryRecord, Message } from "@/types/chat";
 import { useToast } from "../ui/use-toast";
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogFooter, DialogClose } from "../ui/dialog";
 
+const HISTORY_PAGE_SIZE = 50;
+
+const toMessage = (record: HistoryRecord): Message => ({
+  id: String(record.seq),
+  role: record.role,
+  content: record.content,
+  timestamp: record.timestamp ?? "",
+  seq: record.seq,
+});
+
 interface ChatSectionProps {
   onGenerateImage: (prompt: string) => void;
 }
@@ -16,6 +26,10 @@ const ChatSection = ({ onGenerateImage }: ChatSectionProps) => {
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const { toast } = useToast();
   const [showClearConfirm, setShowClearConfirm] = useState(false);
+  const [hasOlder, setHasOlder] = useState(false);
+  const cursorRef = useRef(0);
+  const epochRef = useRef<string | null>(null);
+  const etagRef = useRef<string | null>(null);
 
   // Fetch initial settings or use defaults (already handled in backend/settings)
   // const [chatSettings, setChatSettings] = useState<ChatSettings>({
@@ -25,7 +39,7 @@ const ChatSection = ({ onGenerateImage }: ChatSectionProps) => {
   // });
 
   useEffect(() => {
-    fetchHistory();
+    loadLatestHistory();
   }, []);
 
   useEffect(() => {
@@ -43,30 +57,87 @@ const ChatSection = ({ onGenerateImage }: ChatSectionProps) => {
     };
   }, []);
 
-  const fetchHistory = async () => {
+  // The ETag only proves "nothing new" once every newer record has been received.
+  const applyCursor = (response: Response, page: HistoryPage, caughtUp: boolean) => {
+    cursorRef.current = page.cursor;
+    epochRef.current = page.epoch;
+    etagRef.current = caughtUp ? response.headers.get('ETag') : null;
+  };
+
+  const loadLatestHistory = async (): Promise<Message[]> => {
     try {
-      const response = await fetch('/api/chat/history');
+      const response = await fetch(`/api/chat/history?limit=${HISTORY_PAGE_SIZE}`);
       if (response.ok) {
-        const data = await response.json();
-        setMessages(data);
+        const page: HistoryPage = await response.json();
+        const latest = page.messages.map(toMessage);
+        applyCursor(response, page, true);
+        setMessages(latest);
+        setHasOlder(page.has_more);
+        return latest;
       }
     } catch (error) {
       console.error('Error loading chat history:', error);
     }
+    return [];
+  };
+
+  // Fetches only the records newer than the cursor, page by page; returns what was appended.
+  const syncHistory = async (): Promise<Message[]> => {
+    const newMessages: Message[] = [];
+    try {
+      let hasMore = true;
+      while (hasMore) {
+        const headers: HeadersInit = etagRef.current ? { 'If-None-Match': etagRef.current } : {};
+        const response = await fetch(`/api/chat/history?since=${cursorRef.current}&limit=${HISTORY_PAGE_SIZE}`, { headers });
+        if (response.status === 304 || !response.ok) {
+          break;
+        }
+        const page: HistoryPage = await response.json();
+        if (page.epoch !== epochRef.current) {
+          // History was cleared or the backend restarted; the cursor is meaningless now.
+          return loadLatestHistory();
+        }
+        applyCursor(response, page, !page.has_more);
+        newMessages.push(...page.messages.map(toMessage));
+        hasMore = page.has_more;
+      }
+    } catch (error) {
+      console.error('Error syncing chat history:', error);
+    }
+    if (newMessages.length > 0) {
+      setMessages((prevMessages) => [...prevMessages.filter((m) => !m.pending), ...newMessages]);
+    }
+    return newMessages;
+  };
+
+  const loadOlderHistory = async () => {
+    const oldestSeq = messages.find((m) => m.seq !== undefined)?.seq;
+    if (oldestSeq === undefined) return;
+    try {
+      const response = await fetch(`/api/chat/history?before=${oldestSeq}&limit=${HISTORY_PAGE_SIZE}`);
+      if (response.ok) {
+        const page: HistoryPage = await response.json();
+        setMessages((prevMessages) => [...page.messages.map(toMessage), ...prevMessages]);
+        setHasOlder(page.has_more);
+      }
+    } catch (error) {
+      console.error('Error loading older chat history:', error);
+    }
   };
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
+  const lastMessageId = messages[messages.length - 1]?.id;
   useEffect(() => {
     scrollToBottom();
-  }, [messages]);
+  }, [lastMessageId]);
 
   const handleSendMessage = async () => {
     if (inputMessage.trim() === "") return;
 
-    const newMessage: Message = { id: Date.now().toString(), role: "user", content: inputMessage, timestamp: new Date().toISOString() };
+    const newMessage: Message = { id: Date.now().toString(), role: "user", content: inputMessage, timestamp: new Date().toISOString(), pending: true };
     setMessages((prevMessages) => [...prevMessages, newMessage]);
     setInputMessage("");
 
@@ -84,9 +155,12 @@ const ChatSection = ({ onGenerateImage }: ChatSectionProps) => {
       }
 
       const data = await response.json();
-      const botResponse: Message = { id: Date.now().toString() + '-bot', role: "assistant", content: data.response, timestamp: new Date().toISOString() };
-      setMessages((prevMessages) => [...prevMessages, botResponse]);
-      // Optionally, saveHistory([...messages, newMessage, botResponse]);
+      const synced = await syncHistory();
+      if (!synced.some((m) => m.role === "assistant")) {
+        // Failed replies are not stored in the history, so show them locally.
+        const botResponse: Message = { id: Date.now().toString() + '-bot', role: "assistant", content: data.response, timestamp: new Date().toISOString() };
+        setMessages((prevMessages) => [...prevMessages, botResponse]);
+      }
     } catch (error) {
       console.error("Error sending message:", error);
       toast({
@@ -119,6 +193,9 @@ const ChatSection = ({ onGenerateImage }: ChatSectionProps) => {
       
       if (response.ok) {
         setMessages([]);
+        setHasOlder(false);
+        epochRef.current = null;
+        etagRef.current = null;
         toast({
           title: "Success",
           description: "Chat history cleared successfully",
@@ -142,6 +219,11 @@ const ChatSection = ({ onGenerateImage }: ChatSectionProps) => {
       <CardContent className="flex-grow overflow-hidden p-4">
         <div className="h-full pr-4 overflow-y-auto">
           <div className="space-y-4">
+            {hasOlder && (
+              <div className="flex justify-center">
+                <Button variant="outline" onClick={loadOlderHistory}>Load earlier messages</Button>
+              </div>
+            )}
             {messages.map((msg) => (
               <div key={msg.id} className={`flex ${msg.role === 'user' ? 'justify-end' : 'justify-start'}`}>
                 <div className={`rounded-lg p-3 ${msg.role === 'user' ? 'bg-blue-600 text-white' : msg.role === 'assistant' ? 'bg-gray-700 text-white' : 'bg-red-600 text-white'}`}>
@@ -31,7 +31,8 @@ export default function ImageGrid({ images }: ImageGridProps) {
             onClick={() => setSelectedImage(image)}
           >
             <img
-              src={image}
+              src={`${image}?size=thumb`}
+              loading="lazy"
               alt={`Generated image ${index + 1}`}
               className="object-cover w-full h-full hover:scale-105 transition-transform duration-200"
             />
@@ -6,7 +6,7 @@ import { Button } from '../ui/button'
 import { useToast } from '../ui/use-toast'
 import type { ChatSettings, SettingsProps } from '@/types/settings'
 
-export function ChatSettings({ settings, onSave }: SettingsProps<ChatSettings>) {
+export function ChatSettings({ settings, onSave, catalog }: SettingsProps<ChatSettings>) {
   const [formData, setFormData] = useState(settings)
   const { toast } = useToast()
 
@@ -42,6 +42,23 @@ export function ChatSettings({ settings, onSave }: SettingsProps<ChatSettings>)
       </CardHeader>
       <CardContent>
         <form onSubmit={handleSubmit} className="space-y-4">
+          <div className="space-y-2">
+            <Label htmlFor="model">Model</Label>
+            <Input
+              id="model"
+              name="model"
+              list="chat-models"
+              value={formData.model}
+              onChange={handleChange}
+              placeholder="Enter OpenRouter model id"
+            />
+            <datalist id="chat-models">
+              {catalog?.models.map(model => (
+                <option key={model} value={model} />
+              ))}
+            </datalist>
+          </div>
+
           <div className="space-y-2">
             <Label htmlFor="system_prompt">System Prompt</Label>
             <Input
@@ -103,6 +120,55 @@ export function ChatSettings({ settings, onSave }: SettingsProps<ChatSettings>)
             />
           </div>
 
+          <div className="space-y-2">
+            <Label htmlFor="retrieval_top_k">Recalled Messages</Label>
+            <Input
+              id="retrieval_top_k"
+              name="retrieval_top_k"
+              type="number"
+              min="0"
+              value={formData.retrieval_top_k}
+              onChange={handleChange}
+            />
+          </div>
+
+          <div className="space-y-2">
+            <Label htmlFor="retrieval_token_budget">Recall Token Budget</Label>
+            <Input
+              id="retrieval_token_budget"
+              name="retrieval_token_budget"
+              type="number"
+              min="0"
+              value={formData.retrieval_token_budget}
+              onChange={handleChange}
+            />
+          </div>
+
+          <div className="space-y-2">
+            <Label htmlFor="retrieval_min_score">Recall Minimum Similarity</Label>
+            <Input
+              id="retrieval_min_score"
+              name="retrieval_min_score"
+              type="number"
+              min="0"
+              max="1"
+              step="0.05"
+              value={formData.retrieval_min_score}
+              onChange={handleChange}
+            />
+          </div>
+
+          <div className="space-y-2">
+            <Label htmlFor="embedding_model">Embedding Model</Label>
+            <Input
+              id="embedding_model"
+              name="embedding_model"
+              value={formData.embedding_model}
+              onChange={handleChange}
+              placeholder="Leave empty for the built-in hashing embedder"
+            />
+          </div>
+
           <Button type="submit" className="w-full">
             Save Settings
           </Button>
@@ -6,7 +6,7 @@ import { Button } from '../ui/button'
 import { useToast } from '../ui/use-toast'
 import type { ImageSettings, SettingsProps } from '@/types/settings'
 
-export function ImageSettings({ settings, onSave }: SettingsProps<ImageSettings>) {
+export function ImageSettings({ settings, onSave, catalog }: SettingsProps<ImageSettings>) {
   const [formData, setFormData] = useState(settings)
   const { toast } = useToast()
 
@@ -54,6 +54,23 @@ export function ImageSettings({ settings, onSave }: SettingsProps<ImageSettings>
             />
           </div>
 
+          <div className="space-y-2">
+            <Label htmlFor="engine_id">Engine</Label>
+            <Input
+              id="engine_id"
+              name="engine_id"
+              list="image-engines"
+              value={formData.engine_id}
+              onChange={handleChange}
+              placeholder="Enter Stability engine id"
+            />
+            <datalist id="image-engines">
+              {catalog?.engines.map(engine => (
+                <option key={engine} value={engine} />
+              ))}
+            </datalist>
+          </div>
+
           <div className="space-y-2">
             <Label htmlFor="width">Width</Label>
             <Input
@@ -114,10 +131,16 @@ export function ImageSettings({ settings, onSave }: SettingsProps<ImageSettings>
             <Input
               id="style_preset"
               name="style_preset"
+              list="style-presets"
               value={formData.style_preset}
               onChange={handleChange}
               placeholder="Enter style preset"
             />
+            <datalist id="style-presets">
+              {catalog?.style_presets.map(preset => (
+                <option key={preset} value={preset} />
+              ))}
+            </datalist>
           </div>
 
           <Button type="submit" className="w-full">
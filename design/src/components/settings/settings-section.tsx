@@ -5,7 +5,7 @@ import { ChatSettings } from "./chat-settings";
 import { ImageSettings } from "./image-settings";
 import ThemeSettings from "./theme-settings";
 import { ApiSettings } from "./api-settings";
-import type { Settings } from "@/types/settings";
+import type { ModelCatalog, Settings } from "@/types/settings";
 import { useToast } from '../ui/use-toast';
 
 interface SettingsSectionProps {
@@ -15,16 +15,18 @@ interface SettingsSectionProps {
 export function SettingsSection({ onSave }: SettingsSectionProps) {
   const [activeTab, setActiveTab] = useState('general');
   const [settings, setSettings] = useState<Settings | null>(null);
+  const [catalog, setCatalog] = useState<ModelCatalog | null>(null);
   const { toast } = useToast();
 
   useEffect(() => {
     // Load settings when component mounts
     fetchSettings();
+    fetchCatalog();
   }, []);
 
   const fetchSettings = async () => {
     try {
-      const response = await fetch('http://localhost:8000/api/settings');
+      const response = await fetch('/api/settings');
       if (response.ok) {
         const data = await response.json();
         setSettings(data);
@@ -39,6 +41,18 @@ export function SettingsSection({ onSave }: SettingsSectionProps) {
     }
   };
 
+  const fetchCatalog = async () => {
+    try {
+      const response = await fetch('/api/models');
+      if (response.ok) {
+        const data = await response.json();
+        setCatalog(data);
+      }
+    } catch (error) {
+      console.error('Error loading model catalog:', error);
+    }
+  };
+
   const handleSave = async (section: string, newSettings: any) => {
     try {
       await onSave(section, newSettings);
@@ -77,6 +91,7 @@ export function SettingsSection({ onSave }: SettingsSectionProps) {
         <TabsContent value="chat">
           <ChatSettings
             settings={settings.chat}
+            catalog={catalog}
             onSave={(newSettings) => handleSave('chat', newSettings)}
           />
         </TabsContent>
@@ -84,6 +99,7 @@ export function SettingsSection({ onSave }: SettingsSectionProps) {
         <TabsContent value="image">
           <ImageSettings
             settings={settings.image}
+            catalog={catalog}
             onSave={(newSettings) => handleSave('image', newSettings)}
           />
         </TabsContent>
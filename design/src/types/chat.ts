@@ -7,6 +7,22 @@ export interface Message {
   timestamp: string;
   avatar?: string;
   imageUrl?: string;
+  seq?: number;
+  pending?: boolean;
+}
+
+export interface HistoryRecord {
+  role: 'user' | 'assistant' | 'system';
+  content: string;
+  seq: number;
+  timestamp?: string;
+}
+
+export interface HistoryPage {
+  messages: HistoryRecord[];
+  cursor: number;
+  epoch: string;
+  has_more: boolean;
 }
 
 export interface ChatSettings {
@@ -3,20 +3,27 @@ export interface GeneralSettings {
 }
 
 export interface ChatSettings {
+  model: string;
   system_prompt: string;
   context_length: number;
   history_size: number;
   temperature: number;
   max_tokens: number;
+  retrieval_top_k: number;
+  retrieval_token_budget: number;
+  retrieval_min_score: number;
+  embedding_model: string;
 }
 
 export interface ImageSettings {
   stability_api_key: string;
+  engine_id: string;
   width: number;
   height: number;
   steps: number;
   cfg_scale: number;
   style_preset: string;
+  storage_backend: string;
 }
 
 export interface ThemeSettings {
@@ -39,7 +46,16 @@ export interface Settings {
   api: ApiSettings;
 }
 
+export interface ModelCatalog {
+  engines: string[];
+  models: string[];
+  style_presets: string[];
+  engines_updated: number;
+  models_updated: number;
+}
+
 export interface SettingsProps<T> {
   settings: T;
   onSave: (settings: T) => Promise<void>;
+  catalog?: ModelCatalog | null;
 }
\ No newline at end of file
@@ -10,10 +10,66 @@ import atexit
 #from core.image_generator import ImageGenerator
 #from core.settings import SettingsManager
 from huggingface_hub import login
-import server
+from werkzeug.serving import make_server
 import threading
 import time
 
+# "inprocess" serves the Flask app from a worker thread of this process on
+# localhost; "subprocess" runs server.py as a child on port 8000.
+TRANSPORT = os.environ.get('PEIXONAUTA_TRANSPORT', 'inprocess')
+PORT_FILE = os.path.join('data', 'desktop_port')
+
+class InProcessServer(threading.Thread):
+    """Runs the Flask app on a worker thread of the desktop process.
+
+    The page origin has to stay the same between launches, or the web view
+    loses its localStorage (theme) and HTTP cache. So the server binds the
+    preferred port, then the port a previous fallback saved, and only when
+    both are taken an ephemeral port, which is saved for next time.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8000):
+        super().__init__(daemon=True)
+        import server
+        self.httpd = None
+        for candidate in (port, self._saved_port(), 0):
+            if candidate is None:
+                continue
+            try:
+                self.httpd = make_server(host, candidate, server.app, threaded=True)
+                break
+            except OSError as e:
+                print(f"Port {candidate} unavailable: {e}")
+        if self.httpd is None:
+            raise RuntimeError("Could not bind the in-process Flask server")
+        if self.httpd.server_port != port:
+            self._save_port(self.httpd.server_port)
+        self.url = f"http://{host}:{self.httpd.server_port}"
+
+    @staticmethod
+    def _saved_port():
+        try:
+            with open(PORT_FILE, 'r') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_port(port):
+        try:
+            os.makedirs(os.path.dirname(PORT_FILE), exist_ok=True)
+            with open(PORT_FILE, 'w') as f:
+                f.write(str(port))
+        except OSError as e:
+            print(f"Could not save desktop port: {e}")
+
+    def run(self):
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -28,6 +84,27 @@ class MainWindow(QMainWindow):
         self.web_view = QWebEngineView()
         layout.addWidget(self.web_view)
         
+        self.flask_process = None
+        self.flask_server = None
+        if TRANSPORT == 'subprocess':
+            url = self.start_subprocess_server()
+        else:
+            url = self.start_inprocess_server()
+        
+        atexit.register(self.cleanup)
+        signal.signal(signal.SIGTERM, self.cleanup)
+        signal.signal(signal.SIGINT, self.cleanup)
+        
+        self.web_view.setUrl(QUrl(url))
+
+    def start_inprocess_server(self):
+        print("Starting Flask server in-process...")
+        self.flask_server = InProcessServer()
+        self.flask_server.start()
+        print(f"Flask server listening on {self.flask_server.url}")
+        return self.flask_server.url
+
+    def start_subprocess_server(self):
         print("Starting Flask server...")
         creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
         self.flask_process = subprocess.Popen(
@@ -39,23 +116,18 @@ class MainWindow(QMainWindow):
         )
         print(f"Flask server started with PID: {self.flask_process.pid}")
         
-        self.flask_output_thread = threading.Thread(target=self.read_flask_output, daemon=True)
-        self.flask_output_thread.start()
+        # One reader per pipe so a full stderr buffer can never stall the server.
+        for stream, label in ((self.flask_process.stdout, 'FLASK_STDOUT'),
+                              (self.flask_process.stderr, 'FLASK_STDERR')):
+            threading.Thread(target=self.read_flask_output, args=(stream, label), daemon=True).start()
         
         time.sleep(2)
-        
-        atexit.register(self.cleanup)
-        signal.signal(signal.SIGTERM, self.cleanup)
-        signal.signal(signal.SIGINT, self.cleanup)
-        
-        self.web_view.setUrl(QUrl("http://localhost:8000"))
+        return "http://localhost:8000"
 
-    def read_flask_output(self):
-        """Reads stdout and stderr from the Flask process and prints it."""
-        for line in iter(self.flask_process.stdout.readline, ''):
-            print(f"[FLASK_STDOUT] {line.strip()}")
-        for line in iter(self.flask_process.stderr.readline, ''):
-            print(f"[FLASK_STDERR] {line.strip()}")
+    def read_flask_output(self, stream, label):
+        """Reads one output stream of the Flask process and prints it."""
+        for line in iter(stream.readline, ''):
+            print(f"[{label}] {line.strip()}")
 
     def closeEvent(self, event):
         self.cleanup()
@@ -63,7 +135,11 @@ class MainWindow(QMainWindow):
         
     def cleanup(self, signum=None, frame=None):
         print("Shutting down Flask server...")
-        if hasattr(self, 'flask_process') and self.flask_process:
+        if getattr(self, 'flask_server', None):
+            self.flask_server.shutdown()
+            print("Flask server shut down.")
+            self.flask_server = None
+        if getattr(self, 'flask_process', None):
             try:
                 self.flask_process.terminate()
                 self.flask_process.wait(timeout=5)
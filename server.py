@@ -1,8 +1,11 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response
+from werkzeug.wsgi import wrap_file
 from flask_cors import CORS
 from core.chatbot import Chatbot
 from core.image_generator import ImageGenerator
 from core.settings import SettingsManager
+from core.catalog import ModelCatalog
+from core.image_store import PackImageStore
 import os
 from pathlib import Path
 import base64
@@ -57,12 +60,19 @@ def log_request_info():
 CORS(app)
 
 settings_manager = SettingsManager()
-chatbot = Chatbot(settings_manager)
-image_generator = ImageGenerator(settings_manager)
+model_catalog = ModelCatalog(settings_manager)
+model_catalog.start()
 
 IMAGES_DIR = os.path.join(os.path.dirname(__file__), 'data', 'generated_images')
 os.makedirs(IMAGES_DIR, exist_ok=True)
 
+image_store = None
+if settings_manager.get_setting('image', 'storage_backend') == 'pack':
+    image_store = PackImageStore(os.path.join(IMAGES_DIR, 'packs'))
+
+chatbot = Chatbot(settings_manager, model_catalog)
+image_generator = ImageGenerator(settings_manager, model_catalog, image_store)
+
 @app.route('/')
 def serve_index():
     app.logger.info("=== Root Route Request ===")
@@ -109,12 +119,24 @@ def update_settings():
         for section, values in data.items():
             for key, value in values.items():
                 settings_manager.set_setting(section, key, value)
+        if 'api' in data or 'stability_api_key' in data.get('image', {}):
+            model_catalog.refresh_async()
+        if 'embedding_model' in data.get('chat', {}):
+            chatbot.refresh_embedder()
         app.logger.info("Settings updated successfully.")
         return jsonify({'message': 'Settings updated successfully'})
     except Exception as e:
         app.logger.error(f"Error updating settings: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/models', methods=['GET'])
+def get_models():
+    try:
+        return jsonify(model_catalog.get_catalog())
+    except Exception as e:
+        app.logger.error(f"Error getting model catalog: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     data = request.json
@@ -125,7 +147,7 @@ def chat():
     
     try:
         response = chatbot.generate_response(message)
-        return jsonify({'response': response})
+        return jsonify({'response': response, 'context': chatbot.context_stats})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -155,9 +177,13 @@ def generate_image():
             app.logger.info("Saving generated image...")
             try:
                 image_bytes = base64.b64decode(image_data)
-                with open(filepath, 'wb') as f:
-                    f.write(image_bytes)
-                app.logger.info(f"Image saved to {filepath}")
+                if image_store:
+                    image_store.put(filename, image_bytes, 'image/png')
+                    app.logger.info(f"Image packed as {filename}")
+                else:
+                    with open(filepath, 'wb') as f:
+                        f.write(image_bytes)
+                    app.logger.info(f"Image saved to {filepath}")
             except Exception as e:
                 error_msg = f"Error saving image: {str(e)}\nTraceback: {traceback.format_exc()}"
                 app.logger.error(error_msg)
@@ -178,12 +204,15 @@ def generate_image():
 @app.route('/api/images')
 def list_images():
     try:
-        images = []
+        # Pack mode still lists loose files saved before it was enabled; serve_image
+        # falls back to them for names the store does not hold.
+        images = image_store.list_with_times() if image_store else []
+        packed = {name for name, _ in images}
         for filename in os.listdir(IMAGES_DIR):
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                images.append(f'/api/images/{filename}')
-        images.sort(key=lambda x: os.path.getmtime(os.path.join(IMAGES_DIR, os.path.basename(x))), reverse=True)
-        return jsonify(images)
+            if filename.lower().endswith(('.png', '.jpg', '.jpeg')) and filename not in packed:
+                images.append((filename, os.path.getmtime(os.path.join(IMAGES_DIR, filename))))
+        images.sort(key=lambda item: item[1], reverse=True)
+        return jsonify([f'/api/images/{name}' for name, _ in images])
     except FileNotFoundError:
         return jsonify([])
     except Exception as e:
@@ -192,13 +221,35 @@ def list_images():
 
 @app.route('/api/images/<path:filename>')
 def serve_image(filename):
+    if image_store and filename in image_store:
+        opened = image_store.open(filename, thumbnail=request.args.get('size') == 'thumb')
+        if opened:
+            file, length, mimetype = opened
+            # sendfile-capable only behind an external WSGI server; werkzeug copies in chunks.
+            response = Response(wrap_file(request.environ, file), mimetype=mimetype, direct_passthrough=True)
+            response.content_length = length
+            response.cache_control.max_age = 31536000
+            return response
     return send_from_directory(IMAGES_DIR, filename)
 
 @app.route('/api/chat/history', methods=['GET'])
 def get_chat_history():
     try:
-        history = chatbot.conversation_history
-        return jsonify(history)
+        page = chatbot.get_history(
+            since=request.args.get('since', type=int),
+            before=request.args.get('before', type=int),
+            limit=request.args.get('limit', type=int)
+        )
+        if page['etag'] in request.if_none_match:
+            return '', 304
+        response = jsonify({
+            'messages': page['messages'],
+            'cursor': page['cursor'],
+            'epoch': page['epoch'],
+            'has_more': page['has_more']
+        })
+        response.set_etag(page['etag'])
+        return response
     except Exception as e:
         logging.error(f"Error getting chat history: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -206,8 +257,7 @@ def get_chat_history():
 @app.route('/api/chat/history', methods=['DELETE'])
 def clear_chat_history():
     try:
-        chatbot.conversation_history = []
-        chatbot.save_history()
+        chatbot.clear_history()
         return jsonify({'message': 'Chat history cleared successfully'})
     except Exception as e:
         logging.error(f"Error clearing chat history: {str(e)}")